@@ -1,13 +1,70 @@
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 import httpx
 import asyncio
+from aiolimiter import AsyncLimiter
+from async_lru import alru_cache
+import diskcache
 from dotenv import load_dotenv
 import os
-import math
+import logging
+import hashlib
+import base64
+import numpy as np
+import orjson
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# ------------------- CONFIG -------------------
+
+GRAPHHOPPER_API_KEY = os.getenv("GRAPHHOPPER_API_KEY")
+# endpoint compatible OpenAI : peut pointer vers un VLM local (ex. vLLM /v1/chat/completions)
+OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL", "https://api.deepseek.com/v1/chat/completions")
+OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "google/gemma-3-27b-it:free")
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+OPENROUTER_HEADERS = {
+    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+    "Content-Type": "application/json",
+}
+MAPILLARY_TOKEN = os.getenv("MAPILLARY_TOKEN")
+
+EARTH_RADIUS_M = 6_371_000
+CACHE_TTL = 86400  # 24h : les géocodages changent rarement
+VERDICT_TTL = 86400 * 30  # 30 jours : le contenu d’une image Mapillary ne change pas
+VERDICTS = ("danger", "safe")  # seules réponses acceptées (et mises en cache) du modèle
+ROUTE_MAX_AGE = 300  # 5 min, cache navigateur uniquement : les URLs des miniatures sont signées et expirent
+
+timeout = httpx.Timeout(30.0, connect=10.0)
+limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# Nombre de workers uvicorn. Les limites fournisseurs ci-dessous sont divisées par WORKERS :
+# lancer avec `WEB_CONCURRENCY=N uvicorn main:app` (ou `python main.py`), jamais `--workers N`,
+# que l’application ne voit pas et qui multiplierait ces limites par N.
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+OPENROUTER_CONCURRENCY = int(os.getenv("OPENROUTER_CONCURRENCY", "4"))
+if OPENROUTER_CONCURRENCY < WORKERS:
+    logger.warning(
+        "OPENROUTER_CONCURRENCY=%d < WEB_CONCURRENCY=%d : chaque worker garde 1 appel OpenRouter, "
+        "soit %d appels simultanés au total",
+        OPENROUTER_CONCURRENCY, WORKERS, WORKERS,
+    )
+
+# Singletons partagés par toutes les requêtes (un exemplaire par worker) :
+# les limites fournisseurs sont réparties entre les workers
+CLIENT: httpx.AsyncClient = None  # pool de connexions keep-alive, créé au démarrage
+OPENROUTER_SEM = asyncio.Semaphore(max(1, OPENROUTER_CONCURRENCY // WORKERS))  # appels simultanés max
+# 10 requêtes / seconde max vers Mapillary, tous workers confondus : chaque worker a droit à
+# 10 / WORKERS req/s, avec une capacité d’au moins 1 (aiolimiter refuse toute acquisition sinon)
+MAPILLARY_BURST = max(1, 10 // WORKERS)
+mapillary_limiter = AsyncLimiter(MAPILLARY_BURST, MAPILLARY_BURST * WORKERS / 10)
+# cache persistant des verdicts IA, partagé entre redémarrages et workers
+verdict_cache = diskcache.Cache(os.getenv("VERDICT_CACHE_DIR", ".cache/womanalert"))
+
+# ------------------- APP -------------------
+
 app = FastAPI()
 
 app.add_middleware(
@@ -17,27 +74,47 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# les réponses /route (géométries complètes) pèsent souvent des dizaines de Ko
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
-GRAPHHOPPER_API_KEY = os.getenv("GRAPHHOPPER_API_KEY")
-OPENROUTER_API_URL = "https://api.deepseek.com/v1/chat/completions"
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-MAPILLARY_TOKEN = os.getenv("MAPILLARY_TOKEN")
+async def log_http_version(response: httpx.Response):
+    logger.debug("%s %s → %s", response.request.method, response.url.host, response.http_version)
 
-timeout = httpx.Timeout(30.0, connect=10.0)
-openrouter_lock = asyncio.Lock()
+@app.on_event("startup")
+async def startup():
+    global CLIENT
+    # HTTP/2 : les appels simultanés vers Mapillary / OpenRouter partagent une connexion
+    CLIENT = httpx.AsyncClient(
+        timeout=timeout,
+        limits=limits,
+        http2=True,
+        event_hooks={"response": [log_http_version]},
+    )
+
+@app.on_event("shutdown")
+async def shutdown():
+    await CLIENT.aclose()
 
 # ------------------- UTILS -------------------
 
+def parse_json(resp: httpx.Response):
+    # orjson : plus rapide que resp.json() sur les grosses réponses (trajets, bbox Mapillary)
+    return orjson.loads(resp.content)
+
 async def geocode(place: str):
+    # normaliser pour que "Paris " et "paris" partagent la même entrée du cache
+    return await geocode_cached(place.strip().lower())
+
+@alru_cache(maxsize=4096, ttl=CACHE_TTL)
+async def geocode_cached(place: str):
     url = "https://nominatim.openstreetmap.org/search"
     params = {"q": place, "format": "json", "limit": 1}
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        resp = await client.get(url, params=params)
-        resp.raise_for_status()
-        data = resp.json()
-        if not data:
-            return None
-        return float(data[0]["lat"]), float(data[0]["lon"])
+    resp = await CLIENT.get(url, params=params)
+    resp.raise_for_status()
+    data = parse_json(resp)
+    if not data:
+        return None
+    return float(data[0]["lat"]), float(data[0]["lon"])
 
 async def get_mapillary_image_near_point(lat: float, lon: float, radius: int = 30):
     """Retourne une image Mapillary proche d’un point"""
@@ -49,88 +126,343 @@ async def get_mapillary_image_near_point(lat: float, lon: float, radius: int = 3
         "fields": "id,computed_geometry,thumb_1024_url",
         "access_token": MAPILLARY_TOKEN,
     }
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        resp = await client.get(url, params=params)
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("data", [])
+    async with mapillary_limiter:
+        resp = await CLIENT.get(url, params=params)
+    resp.raise_for_status()
+    data = parse_json(resp)
+    return data.get("data", [])
 
-async def get_mapillary_images_along_route(coords_list, step: int = 10):
+async def get_mapillary_images(bbox: str, limit: int = 50):
+    """Retourne les images Mapillary d’une bbox "minlon,minlat,maxlon,maxlat" en un seul appel"""
+    url = "https://graph.mapillary.com/images"
+    params = {
+        "bbox": bbox,
+        "limit": limit,
+        "fields": "id,computed_geometry,thumb_1024_url",
+        "access_token": MAPILLARY_TOKEN,
+    }
+    async with mapillary_limiter:
+        resp = await CLIENT.get(url, params=params)
+    resp.raise_for_status()
+    data = parse_json(resp)
+    return data.get("data", [])
+
+def min_distance_to_route(points, route):
+    """
+    Distance (m) entre chaque point et le segment du trajet le plus proche,
+    en projection équirectangulaire centrée sur le point (précise à l’échelle d’une ville).
+    points: (M, 2) et route: (N, 2), en [lon, lat] degrés → retourne (M,)
+    """
+    points = np.radians(points)
+    route = np.radians(route)
+    cos_lat = np.cos(points[:, 1])[:, None]
+    # sommets du trajet en coordonnées planes relatives à chaque point : (M, N)
+    x = (route[None, :, 0] - points[:, None, 0]) * cos_lat
+    y = route[None, :, 1] - points[:, None, 1]
+    if route.shape[0] == 1:
+        return EARTH_RADIUS_M * np.hypot(x[:, 0], y[:, 0])
+    ax, ay = x[:, :-1], y[:, :-1]
+    dx, dy = x[:, 1:] - ax, y[:, 1:] - ay
+    seg_len2 = dx ** 2 + dy ** 2
+    # projection du point (origine) sur chaque segment, bornée aux extrémités
+    t = np.clip(-(ax * dx + ay * dy) / np.where(seg_len2 == 0, 1, seg_len2), 0, 1)
+    return EARTH_RADIUS_M * np.hypot(ax + t * dx, ay + t * dy).min(axis=1)
+
+def simplify_route(route, epsilon: float = 1e-4):
+    """
+    Ramer–Douglas–Peucker (itératif) : ne garde que les points qui s’écartent
+    de plus de `epsilon` degrés (~10 m) du segment simplifié.
+    route: (N, 2) en [lon, lat] → retourne (K, 2), K ≤ N
+    """
+    if len(route) < 3:
+        return route
+    keep = np.zeros(len(route), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(route) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = route[start], route[end]
+        pts = route[start + 1:end]
+        dx, dy = b - a
+        norm = np.hypot(dx, dy)
+        if norm == 0:
+            dists = np.hypot(pts[:, 0] - a[0], pts[:, 1] - a[1])
+        else:
+            dists = np.abs(dx * (pts[:, 1] - a[1]) - dy * (pts[:, 0] - a[0])) / norm
+        i = int(np.argmax(dists))
+        if dists[i] > epsilon:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return route[keep]
+
+def densify_route(route, max_gap_m: float = 150):
+    """
+    Ajoute des points intermédiaires pour qu’aucun segment ne dépasse `max_gap_m` mètres
+    (après RDP, une ligne droite ne garde que ses deux extrémités).
+    route: (N, 2) en [lon, lat] → retourne (K, 2), K ≥ N
+    """
+    if len(route) < 2:
+        return route
+    a, b = route[:-1], route[1:]
+    cos_lat = np.cos(np.radians((a[:, 1] + b[:, 1]) / 2))
+    lengths = EARTH_RADIUS_M * np.hypot(np.radians(b[:, 0] - a[:, 0]) * cos_lat, np.radians(b[:, 1] - a[:, 1]))
+    parts = np.maximum(1, np.ceil(lengths / max_gap_m)).astype(int)
+    seg = np.repeat(np.arange(len(a)), parts)
+    # k = 0..parts-1 dans chaque segment → fraction k / parts le long du segment
+    k = np.arange(parts.sum()) - np.repeat(np.cumsum(parts) - parts, parts)
+    t = (k / parts[seg])[:, None]
+    return np.vstack([a[seg] + t * (b[seg] - a[seg]), route[-1:]])
+
+async def get_mapillary_images_along_route(coords_list, radius: int = 30):
+    """
+    Récupère les images de la bbox du trajet en un seul appel, puis garde celles
+    à moins de `radius` mètres du tracé.
+    Si rien n’est trouvé, repli sur l’échantillonnage point par point.
+    """
+    route = np.asarray(coords_list, dtype=np.float64)
+    min_lon, min_lat = route.min(axis=0)
+    max_lon, max_lat = route.max(axis=0)
+    d = radius / 111_000  # marge en degrés (~1° = 111 km)
+    bbox = f"{min_lon - d},{min_lat - d},{max_lon + d},{max_lat + d}"
+
+    try:
+        candidates = await get_mapillary_images(bbox, limit=50)
+    except httpx.HTTPStatusError:
+        candidates = []  # bbox refusée (trajet trop long) → repli
+    candidates = [img for img in candidates if img.get("computed_geometry")]
+
+    if candidates:
+        img_coords = np.array([img["computed_geometry"]["coordinates"] for img in candidates], dtype=np.float64)
+        distances = min_distance_to_route(img_coords, route)
+        images = [img for img, dist in zip(candidates, distances) if dist < radius]
+        if images:
+            return images
+
+    return await sample_mapillary_images_along_route(route)
+
+async def sample_mapillary_images_along_route(route):
     """
     Échantillonne le trajet et récupère des images proches des points.
-    step = 10 → prend un point sur 10 (réduit le nombre d’appels)
+    Le trajet est d’abord simplifié (RDP) pour éviter les points quasi identiques,
+    puis les longs segments sont recoupés pour garder un point tous les ~150 m.
     """
+    points = densify_route(simplify_route(route))
+    sem = asyncio.Semaphore(8)  # requêtes simultanées max
+
+    async def fetch(lon, lat):
+        async with sem:
+            return await get_mapillary_image_near_point(lat, lon)
+
+    results = await asyncio.gather(*(fetch(lon, lat) for lon, lat in points), return_exceptions=True)
+
     images = []
-    for i in range(0, len(coords_list), step):
-        lon, lat = coords_list[i]
-        nearby = await get_mapillary_image_near_point(lat, lon)
-        if nearby:
-            images.extend(nearby)
-        await asyncio.sleep(0.2)  # éviter rate-limit
+    for nearby in results:
+        if isinstance(nearby, Exception) or not nearby:
+            continue
+        images.extend(nearby)
     return images
 
 # ------------------- IA ANALYSE -------------------
 
-async def analyze_image(image_url: str, retries=3):
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
+def openrouter_request(content, **options):
+    """Construit le corps JSON (sérialisé avec orjson) d’un appel OpenRouter"""
     payload = {
-        "model": "google/gemma-3-27b-it:free",
+        "model": OPENROUTER_MODEL,
         "messages": [
             {
                 "role": "user",
-                "content": f"Analyse cette image et réponds uniquement par 'safe' ou 'danger': {image_url}"
+                "content": content
             }
         ],
+        **options,
     }
+    return orjson.dumps(payload)
+
+async def with_openrouter_retries(call, retries=3):
+    """Exécute `call` en respectant OPENROUTER_SEM et en réessayant sur 429"""
+    async with OPENROUTER_SEM:
+        for attempt in range(retries):
+            try:
+                return await call()
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 429:
+                    retry_after = e.response.headers.get("Retry-After")
+                    wait = int(retry_after) if retry_after else 5
+                    await asyncio.sleep(wait)
+                else:
+                    raise
+        raise HTTPException(status_code=429, detail="Trop de requêtes vers OpenRouter, réessayer plus tard.")
+
+async def openrouter_chat(content, retries=3):
+    """Envoie un message à OpenRouter et retourne le texte de la réponse"""
+    body = openrouter_request(content)
+
+    async def call():
+        resp = await CLIENT.post(OPENROUTER_API_URL, headers=OPENROUTER_HEADERS, content=body)
+        resp.raise_for_status()
+        result = parse_json(resp)
+        return result["choices"][0]["message"]["content"].strip().lower()
 
-    async with openrouter_lock:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            for attempt in range(retries):
+    return await with_openrouter_retries(call, retries)
+
+async def openrouter_verdict(content, retries=3):
+    """
+    Variante en streaming pour les réponses 'safe'/'danger' :
+    on coupe la réponse dès que l’un des deux mots apparaît.
+    Retourne None si aucun des deux n’apparaît.
+    """
+    body = openrouter_request(content, stream=True, max_tokens=4)
+
+    async def call():
+        text = ""
+        async with CLIENT.stream("POST", OPENROUTER_API_URL, headers=OPENROUTER_HEADERS, content=body) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                # flux SSE : "data: {...}", terminé par "data: [DONE]"
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
                 try:
-                    resp = await client.post(OPENROUTER_API_URL, headers=headers, json=payload)
-                    resp.raise_for_status()
-                    result = resp.json()
-                    return result["choices"][0]["message"]["content"].strip().lower()
-                except httpx.HTTPStatusError as e:
-                    if e.response.status_code == 429:
-                        retry_after = e.response.headers.get("Retry-After")
-                        wait = int(retry_after) if retry_after else 5
-                        await asyncio.sleep(wait)
-                    else:
-                        raise
-            raise HTTPException(status_code=429, detail="Trop de requêtes vers OpenRouter, réessayer plus tard.")
+                    choices = orjson.loads(data).get("choices")
+                except ValueError:
+                    continue  # chunk tronqué ou mal formé : on l’ignore
+                if not choices:
+                    continue
+                text += (choices[0].get("delta", {}).get("content") or "").lower()
+                for verdict in VERDICTS:
+                    if verdict in text:
+                        return verdict  # fermer le flux annule le reste de la génération
+        return None  # refus ou réponse hors format
+
+    return await with_openrouter_retries(call, retries)
+
+def verdict_key(img):
+    """Clé de cache stable : l’id Mapillary (l’URL de la miniature est signée et expire)"""
+    if img.get("id"):
+        return f"mapillary:{img['id']}"
+    return hashlib.blake2b(img["thumb_1024_url"].encode(), digest_size=16).hexdigest()
+
+async def get_cached_verdict(key: str):
+    # accès disque hors de la boucle d’événements
+    return await asyncio.to_thread(verdict_cache.get, key)
+
+async def cache_verdict(key: str, verdict: str):
+    await asyncio.to_thread(verdict_cache.set, key, verdict, expire=VERDICT_TTL)
+
+async def fetch_image_data_uri(image_url: str):
+    """
+    Télécharge l’image et la retourne en data URI base64 (le modèle n’a pas à la récupérer).
+    Retourne None si l’image est indisponible (URL signée expirée, 403...).
+    """
+    try:
+        resp = await CLIENT.get(image_url)
+        resp.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    content_type = resp.headers.get("content-type", "image/jpeg")
+    return f"data:{content_type};base64,{base64.b64encode(resp.content).decode()}"
+
+def image_part(data_uri: str):
+    return {"type": "image_url", "image_url": {"url": data_uri}}
+
+async def analyze_image(data_uri: str, retries=3):
+    return await openrouter_verdict(
+        [
+            {"type": "text", "text": "Analyse cette image et réponds uniquement par 'safe' ou 'danger'."},
+            image_part(data_uri),
+        ],
+        retries,
+    )
+
+async def analyze_image_batch(data_uris: list[str], retries=3):
+    """
+    Analyse plusieurs images (data URIs déjà téléchargées) en un seul appel.
+    Retourne une liste de 'safe'/'danger' dans l'ordre, ou None si la réponse est inexploitable.
+    """
+    content = await openrouter_chat(
+        [
+            {
+                "type": "text",
+                "text": f"Analyse ces {len(data_uris)} images et réponds uniquement par un tableau JSON "
+                        "de 'safe'/'danger' dans l'ordre, sans autre texte.",
+            },
+            *(image_part(data_uri) for data_uri in data_uris),
+        ],
+        retries,
+    )
+    # le modèle entoure parfois le JSON d'un bloc ```json ... ```
+    content = content[content.find("["):content.rfind("]") + 1]
+    try:
+        decisions = orjson.loads(content)
+    except ValueError:
+        return None
+    if not isinstance(decisions, list) or len(decisions) != len(data_uris):
+        return None
+    decisions = [str(d).strip().lower() for d in decisions]
+    if any(d not in VERDICTS for d in decisions):
+        return None
+    return decisions
+
+def decided_status(decisions):
+    """
+    Retourne 'safe'/'danger' si les images restantes (None) ne peuvent plus
+    changer la majorité, sinon None. En cas d’égalité le trajet est 'safe'.
+    """
+    danger_count = decisions.count("danger")
+    remaining = decisions.count(None)
+    safe_count = len(decisions) - remaining - danger_count
+    if safe_count >= danger_count + remaining:
+        return "safe"
+    if danger_count > safe_count + remaining:
+        return "danger"
+    return None
 
 async def classify_route_safety(images):
-    safe_count = 0
-    danger_count = 0
     max_images = 5  # Limite nombre images analysées
 
-    for img in images[:max_images]:
-        image_url = img.get("thumb_1024_url")
-        if not image_url:
-            continue
-        decision = await analyze_image(image_url)
-        if "danger" in decision:
-            danger_count += 1
+    images = [img for img in images[:max_images] if img.get("thumb_1024_url")]
+    if not images:
+        return "safe"
+
+    keys = [verdict_key(img) for img in images]
+    decisions = await asyncio.gather(*(get_cached_verdict(key) for key in keys))
+    missing = [i for i, d in enumerate(decisions) if d is None]
+    if missing and decided_status(decisions) is None:
+        # téléchargées une seule fois, réutilisées par l’appel groupé et par le repli
+        data_uris = await asyncio.gather(*(fetch_image_data_uri(images[i]["thumb_1024_url"]) for i in missing))
+        available = [(i, data_uri) for i, data_uri in zip(missing, data_uris) if data_uri is not None]
+        fresh = await analyze_image_batch([data_uri for _, data_uri in available]) if available else []
+        if fresh is not None:
+            for (i, _), verdict in zip(available, fresh):
+                decisions[i] = verdict
+                await cache_verdict(keys[i], verdict)
         else:
-            safe_count += 1
-        await asyncio.sleep(1)  # éviter rate-limit
+            # réponse groupée invalide → une requête par image, jusqu’à ce que la majorité soit acquise
+            for i, data_uri in available:
+                decisions[i] = await analyze_image(data_uri)
+                if decisions[i] is not None:
+                    await cache_verdict(keys[i], decisions[i])
+                    if decided_status(decisions) is not None:
+                        break
 
-    return "safe" if safe_count >= danger_count else "danger"
+    # les images sans verdict exploitable ne comptent pas
+    return decided_status([d for d in decisions if d is not None])
 
 # ------------------- ROUTES -------------------
 
 @app.get("/")
-async def root():
+async def root() -> dict:
     return {"message": "API fonctionne !"}
 
 @app.get("/route")
-async def get_route(start_place: str = Query(...), end_place: str = Query(...)):
-    start_coords = await geocode(start_place)
-    end_coords = await geocode(end_place)
+async def get_route(response: Response, start_place: str = Query(...), end_place: str = Query(...)) -> dict:
+    start_coords, end_coords = await asyncio.gather(geocode(start_place), geocode(end_place))
     if not start_coords or not end_coords:
         return {"error": "Lieu introuvable"}
 
@@ -148,32 +480,46 @@ async def get_route(start_place: str = Query(...), end_place: str = Query(...)):
         "key": GRAPHHOPPER_API_KEY
     }
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        resp = await client.get(gh_url, params=params)
-        resp.raise_for_status()
-        route_data = resp.json()
-
-    routes_with_status = []
+    resp = await CLIENT.get(gh_url, params=params)
+    resp.raise_for_status()
+    route_data = parse_json(resp)
 
-    for path in route_data.get("paths", []):
+    async def process_path(path):
         coords_list = path["points"]["coordinates"]  # [ [lon, lat], ... ]
 
         # récupérer les images le long du trajet
-        images = await get_mapillary_images_along_route(coords_list, step=15)
+        images = await get_mapillary_images_along_route(coords_list)
 
         # analyser les images
         status = await classify_route_safety(images)
 
-        routes_with_status.append({
+        return {
             "geometry": path["points"],
             "distance": path.get("distance"),
             "time": path.get("time"),
             "status": status,
             "images": [img.get("thumb_1024_url") for img in images[:5]]  # renvoyer quelques images au frontend
-        })
+        }
+
+    # traiter les trajets alternatifs en parallèle (OPENROUTER_SEM borne les appels IA)
+    routes_with_status = await asyncio.gather(*(process_path(path) for path in route_data.get("paths", [])))
 
+    response.headers["Cache-Control"] = f"private, max-age={ROUTE_MAX_AGE}"
     return {
         "routes": routes_with_status,
         "start": {"lat": start_lat, "lon": start_lon},
         "end": {"lat": end_lat, "lon": end_lon},
     }
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # uvloop + httptools ; chaque worker crée son propre pool httpx au démarrage.
+    # Le nombre de workers vient de WEB_CONCURRENCY (voir WORKERS) : en CLI, utiliser
+    # `WEB_CONCURRENCY=N uvicorn main:app --loop uvloop --http httptools`, pas `--workers N`.
+    uvicorn.run(
+        "main:app",
+        loop="uvloop",
+        http="httptools",
+        workers=WORKERS,
+    )